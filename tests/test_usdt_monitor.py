@@ -0,0 +1,95 @@
+"""
+Smoke-тест: модуль монитора импортируется, а адрес токен аккаунта вычисляется корректно
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+for module in ("aiohttp", "numpy", "orjson", "zstandard", "solders"):
+    pytest.importorskip(module)
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import usdt_monitor  # noqa: E402
+
+
+def test_associated_token_account():
+    assert usdt_monitor.ATA_STR == "FpprVyKxugb44itrKZavQ4BwEi2EoeuMbNiqySixkvqt"
+
+
+def test_format_number():
+    assert usdt_monitor.format_number(0) == "0"
+    assert usdt_monitor.format_number(1234567.5) == "1 234 567.5"
+
+
+def _transaction(amount_before: int, amount_after: int) -> dict:
+    def token_balance(amount: int) -> dict:
+        return {
+            "accountIndex": 1,
+            "mint": usdt_monitor.USDC_MINT_ADDRESS,
+            "owner": usdt_monitor.MONITORED_ADDRESS,
+            "uiTokenAmount": {"amount": str(amount)},
+        }
+    
+    return {
+        "blockTime": None,
+        "meta": {"preTokenBalances": [token_balance(amount_before)], "postTokenBalances": [token_balance(amount_after)]},
+    }
+
+
+def test_sync_transactions_chunks_and_skips_failed(monkeypatch):
+    signatures = [{"signature": f"sig{i}", "err": None} for i in range(120, 0, -1)]
+    batch_sizes = []
+    
+    async def fake_rpc_batch(calls):
+        if calls[0][0] == "getSignaturesForAddress":
+            return {1: list(signatures)}
+        batch_sizes.append(len(calls))
+        results = {}
+        for call_id, (_, params) in enumerate(calls, start=1):
+            if params[0] == "sig5":
+                results[call_id] = usdt_monitor.RpcError("test", {"code": -32602, "message": "bad"})
+            else:
+                results[call_id] = _transaction(0, 1_000_000)
+        return results
+    
+    async def fake_send_discord_message(content, embed=None):
+        return True
+    
+    monkeypatch.setattr(usdt_monitor, "rpc_batch", fake_rpc_batch)
+    monkeypatch.setattr(usdt_monitor, "send_discord_message", fake_send_discord_message)
+    monkeypatch.setattr(usdt_monitor, "last_signature", "sig0")
+    monkeypatch.setattr(usdt_monitor, "total_usdc_received", 0.0)
+    
+    async def run():
+        processed = await usdt_monitor.sync_transactions(balance=119.0)
+        await asyncio.gather(*usdt_monitor.background_tasks)
+        return processed
+    
+    assert asyncio.run(run()) == 120
+    assert batch_sizes == [50, 50, 20]
+    assert usdt_monitor.last_signature == "sig120"
+    assert usdt_monitor.total_usdc_received == 119.0
+    assert usdt_monitor.last_known_balance == 119.0
+
+
+def test_sync_after_notification_retries_until_indexed(monkeypatch):
+    results = iter([0, 0, 1])
+    calls = []
+    
+    async def fake_sync_transactions(balance=None):
+        calls.append(balance)
+        return next(results)
+    
+    async def no_sleep(delay):
+        pass
+    
+    monkeypatch.setattr(usdt_monitor, "sync_transactions", fake_sync_transactions)
+    monkeypatch.setattr(usdt_monitor.asyncio, "sleep", no_sleep)
+    monkeypatch.setattr(usdt_monitor, "last_known_balance", 10.0)
+    
+    asyncio.run(usdt_monitor.sync_after_notification(15.0))
+    assert calls == [15.0, 15.0, 15.0]
@@ -2,80 +2,322 @@
 # -*- coding: utf-8 -*-
 """
 Монитор USDC транзакций на Solana адресе
-Отслеживает входящие USDC транзакции на указанный адрес каждые 5 минут
+Отслеживает входящие USDC транзакции на указанный адрес через WebSocket подписку
+и отправляет статистику каждые 5 минут
 """
 
-import time
+import asyncio
+import base64
+import functools
+import gzip
 import json
-from datetime import datetime, timedelta
-from typing import List, Tuple, Optional
-import requests
-from solana.rpc.api import Client
-from solana.rpc.types import TokenAccountOpts
+import os
+import random
+import struct
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple, Optional, Union
+import aiohttp
+import numpy as np
+import orjson
+import zstandard
 from solders.pubkey import Pubkey
+from solders.token.associated import get_associated_token_address
 
 # Конфигурация
-SOLANA_RPC_URL = "https://api.mainnet-beta.solana.com"
+# Основной RPC endpoint (например, платного провайдера) задается через переменные окружения
+SOLANA_RPC_URL = os.getenv("SOLANA_RPC_URL", "https://api.mainnet-beta.solana.com")
+SOLANA_WS_URL = os.getenv("SOLANA_WS_URL", SOLANA_RPC_URL.replace("https://", "wss://", 1))
+# Дополнительные RPC endpoint'ы для хеджированных запросов: список через запятую в
+# SOLANA_RPC_EXTRA_ENDPOINTS. Публичные endpoint'ы по умолчанию используются, только если
+# основной SOLANA_RPC_URL не задан - запросы к платному провайдеру не уходят третьим лицам
+DEFAULT_EXTRA_ENDPOINTS = "" if os.getenv("SOLANA_RPC_URL") else "https://solana-rpc.publicnode.com,https://solana.drpc.org"
+ENDPOINTS: List[str] = list(dict.fromkeys([
+    SOLANA_RPC_URL,
+    *(url.strip() for url in os.getenv("SOLANA_RPC_EXTRA_ENDPOINTS", DEFAULT_EXTRA_ENDPOINTS).split(",") if url.strip()),
+]))
+HEDGE_FANOUT = 2  # сколько самых быстрых endpoint'ов опрашивается параллельно
+HTTP_TIMEOUT = 10  # таймаут HTTP запросов (RPC и Discord) в секундах
+HTTP_MAX_CONNECTIONS = 8  # максимум keep-alive соединений на один хост
+LATENCY_EWMA_ALPHA = 0.3  # вес нового замера в скользящей средней задержки
+RETRY_STATUSES = {429, 500, 502, 503, 504}  # HTTP статусы временных ошибок, после которых запрос повторяется
+# Коды JSON-RPC ошибок в теле ответа, после которых запрос повторяется: узел отстает (-32005),
+# блок или его статус еще недоступны (-32004, -32014), минимальный слот не достигнут (-32016),
+# лимит запросов провайдера при HTTP 200 (429, -32429)
+RPC_RETRY_CODES = {-32005, -32004, -32014, -32016, 429, -32429}
+RETRY_MAX_DELAY = 30  # максимальная пауза между повторами в секундах
+HISTORY_WINDOW = 86400  # самый длинный период статистики (24 часа) в секундах
+HISTORY_INITIAL_CAPACITY = 4096  # начальный размер массивов истории транзакций
 MONITORED_ADDRESS = "9ApaAe39Z8GEXfqm7F7HL545N4J4tN7RhF8FhS88pRNp"
 USDC_MINT_ADDRESS = "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"  # USDC на Solana
+USDC_DECIMALS = 6  # USDC имеет 6 знаков после запятой
+TOKEN_AMOUNT_OFFSET = 64  # смещение баланса (uint64, little-endian) в данных токен аккаунта
+SIGNATURES_PAGE_LIMIT = 1000  # максимум подписей в одном ответе getSignaturesForAddress
+TRANSACTIONS_BATCH_SIZE = 50  # максимум вызовов getTransaction в одном пакетном запросе
 CHECK_INTERVAL = 300  # 5 минут в секундах
+WS_RECONNECT_DELAY = 5  # пауза перед переподключением WebSocket в секундах
+WS_HEARTBEAT = 30  # интервал ping для обнаружения оборванного WebSocket в секундах
+NOTIFICATION_SYNC_ATTEMPTS = 4  # сколько раз искать транзакцию после уведомления о росте баланса
+NOTIFICATION_SYNC_RETRY_DELAY = 2  # пауза между такими попытками в секундах
 DISCORD_WEBHOOK_URL = ""
 # Дата окончания: 10 января 2026 года 16:00 UTC
 END_DATE = datetime(2026, 1, 10, 16, 0, 0)
 
+# Ассоциированный токен аккаунт USDC - детерминированный адрес (owner, mint),
+# вычисляется один раз при запуске; дальше используется только его строковое представление
+ATA_STR = str(get_associated_token_address(
+    Pubkey.from_string(MONITORED_ADDRESS),
+    Pubkey.from_string(USDC_MINT_ADDRESS)
+))
+
+# Запросы к RPC и Discord собираются и разбираются напрямую через orjson
+JSON_HEADERS = {"Content-Type": "application/json"}
+# Ответы RPC принимаются сжатыми (zstd в aiohttp не декодируется, поэтому не запрашивается)
+RPC_HEADERS = {**JSON_HEADERS, "Accept-Encoding": "gzip, deflate"}
+# Данные аккаунта в WebSocket уведомлениях приходят в кодировке base64+zstd
+ZSTD_DECOMPRESSOR = zstandard.ZstdDecompressor()
+HTTP_REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+# Тело запроса в Discord отправляется сжатым gzip; Discord не документирует сжатые запросы,
+# поэтому при отказе (400/415) запрос повторяется без сжатия и сжатие отключается
+DISCORD_GZIP_HEADERS = {**JSON_HEADERS, "Content-Encoding": "gzip"}
+DISCORD_GZIP_REJECT_STATUSES = {400, 415}
+
+# Таблица замены разделителя тысяч для format_number
+_THOUSANDS_SEPARATOR = str.maketrans(',', ' ')
+
+# Поля Discord embed: первые три отправляются всегда, остальные - по мере накопления данных
+_EMBED_FIELDS = [
+    {"name": name, "value": "", "inline": False}
+    for name in (
+        "💰 Всего собрано",
+        "⏱️ За последние 5 минут",
+        "⏰ До окончания",
+        "⏱️ За последние 15 минут",
+        "⏱️ За последний час",
+        "⏱️ За последние 6 часов",
+        "⏱️ За последние 12 часов",
+        "⏱️ За последние сутки",
+    )
+]
+# Ключи статистики для необязательных полей embed (в порядке полей)
+_EMBED_PERIOD_KEYS = ("last_15_min", "last_hour", "last_6h", "last_12h", "last_24h")
+# Шаблон embed для Discord
+_EMBED_TEMPLATE = {
+    "title": "Ranger Finance сбор USDC",
+    "color": 0x3498db,  # Синий цвет
+    "fields": [],
+    "footer": {
+        "text": f"Адрес: {MONITORED_ADDRESS[:8]}...{MONITORED_ADDRESS[-8:]}"
+    }
+}
+
+# Общая HTTP сессия для RPC, WebSocket и Discord (создается при запуске мониторинга внутри event loop)
+http_session: Optional[aiohttp.ClientSession] = None
+# Скользящая средняя (EWMA) задержки ответа каждого endpoint'а в секундах
+endpoint_latency: Dict[str, float] = {url: 0.0 for url in ENDPOINTS}
+
 # Глобальные переменные для отслеживания
 total_usdc_received = 0.0
-# История транзакций: список кортежей (время, сумма)
-transaction_history: List[Tuple[datetime, float]] = []
-# Время начала мониторинга
-monitoring_start_time: Optional[datetime] = None
+# История транзакций: параллельные массивы времени (time.monotonic(), по возрастанию) и сумм,
+# заполнены первые history_size элементов; при заполнении размер удваивается
+history_ts = np.empty(HISTORY_INITIAL_CAPACITY, dtype=np.float64)
+history_amounts = np.empty(HISTORY_INITIAL_CAPACITY, dtype=np.float64)
+history_size = 0
+# Время последнего входящего перевода (только для отображения)
+last_tx_time: Optional[datetime] = None
+# Время начала мониторинга (time.monotonic())
+monitoring_start_time: Optional[float] = None
+# Последний известный баланс USDC (обновляется по уведомлениям WebSocket и при каждой сверке)
+last_known_balance = 0.0
+# Последняя обработанная подпись транзакции токен аккаунта
+last_signature: Optional[str] = None
+# Сверки запускаются и из WebSocket, и из основного цикла - выполняем их по очереди
+sync_lock = asyncio.Lock()
+# Принимает ли Discord сжатое gzip тело запроса (отключается после первого отказа)
+discord_gzip_enabled = True
+# Фоновые задачи отправки уведомлений (ссылки хранятся, чтобы задачи не были собраны сборщиком мусора)
+background_tasks: set = set()
 
 
-def get_usdc_balance(address: str) -> float:
+class RpcError(RuntimeError):
     """
-    Получает текущий баланс USDC на адресе
+    Ошибка, возвращенная узлом в теле JSON-RPC ответа
+    """
+    def __init__(self, url: str, error: dict):
+        self.code = error.get("code")
+        self.message = error.get("message", "")
+        super().__init__(f"RPC ошибка от {url}: {error}")
+
+
+def _is_account_not_found(error: BaseException) -> bool:
+    """
+    Проверяет, что узел сообщил об отсутствии аккаунта (ATA еще не создан)
+    """
+    return isinstance(error, RpcError) and "could not find account" in error.message
+
+
+def _is_transient_error(error: BaseException) -> bool:
+    """
+    Проверяет, является ли ошибка временной (имеет смысл повторить запрос)
+    """
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in RETRY_STATUSES
+    if isinstance(error, RpcError):
+        return error.code in RPC_RETRY_CODES
+    return isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+
+def _retry_delay(error: BaseException, attempt: int, base: float, jitter: bool) -> float:
     """
+    Вычисляет паузу перед повтором: экспоненциальная задержка или Retry-After от сервера
+    """
+    headers = getattr(error, "headers", None)
+    retry_after = headers.get("Retry-After") if headers else None
+    if retry_after:
+        try:
+            return min(float(retry_after), RETRY_MAX_DELAY)
+        except ValueError:
+            pass
+    
+    delay = base * 2 ** attempt
+    if jitter:
+        delay += random.random() * base
+    return min(delay, RETRY_MAX_DELAY)
+
+
+def retry(attempts: int = 4, base: float = 0.5, jitter: bool = True):
+    """
+    Декоратор для корутин: повторяет вызов с экспоненциальной задержкой
+    при временных ошибках (429, 5xx, временные JSON-RPC ошибки, обрыв соединения, таймаут)
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            for attempt in range(attempts):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    if attempt == attempts - 1 or not _is_transient_error(e):
+                        raise
+                    await asyncio.sleep(_retry_delay(e, attempt, base, jitter))
+        return wrapper
+    return decorator
+
+
+def _update_latency(url: str, elapsed: float):
+    """
+    Обновляет скользящую среднюю задержки endpoint'а
+    """
+    endpoint_latency[url] = (1 - LATENCY_EWMA_ALPHA) * endpoint_latency[url] + LATENCY_EWMA_ALPHA * elapsed
+
+
+async def _post_rpc(url: str, payload: Union[dict, list]) -> Union[dict, list]:
+    """
+    Отправляет JSON-RPC запрос на один endpoint и проверяет корректность ответа
+    """
+    started = time.monotonic()
     try:
-        client = Client(SOLANA_RPC_URL)
-        owner_pubkey = Pubkey.from_string(address)
-        mint_pubkey = Pubkey.from_string(USDC_MINT_ADDRESS)
-        
-        # Получаем все токен аккаунты владельца с указанным mint
-        token_accounts = client.get_token_accounts_by_owner(
-            owner_pubkey,
-            TokenAccountOpts(mint=mint_pubkey)
-        )
+        async with http_session.post(
+            url, data=orjson.dumps(payload), headers=RPC_HEADERS, timeout=HTTP_REQUEST_TIMEOUT
+        ) as response:
+            response.raise_for_status()
+            data = orjson.loads(await response.read())
         
-        if token_accounts.value and len(token_accounts.value) > 0:
-            # Получаем первый токен аккаунт
-            token_account = token_accounts.value[0]
-            account_pubkey = token_account.pubkey
-            
-            # Получаем информацию об аккаунте
-            account_info = client.get_account_info(account_pubkey)
-            
-            # Получаем баланс через RPC метод
-            try:
-                balance_response = client.get_token_account_balance(account_pubkey)
-                if balance_response.value:
-                    # USDC имеет 6 знаков после запятой
-                    balance_ui = balance_response.value.ui_amount or 0.0
-                    return balance_ui
-            except Exception:
-                # Альтернативный способ: парсим данные напрямую
-                if account_info.value and account_info.value.data:
-                    data = account_info.value.data
-                    if len(data) >= 72:
-                        # Баланс хранится в байтах 64-72 (uint64, little-endian)
-                        balance_bytes = bytes(data[64:72])
-                        balance = int.from_bytes(balance_bytes, byteorder='little')
-                        # USDC имеет 6 знаков после запятой
-                        balance_usdc = balance / 1_000_000
-                        return balance_usdc
-        
-        return 0.0
+        if isinstance(payload, dict):
+            if "error" in data:
+                raise RpcError(url, data["error"])
+            if "result" not in data:
+                raise RuntimeError(f"Некорректный ответ RPC от {url}")
+        else:
+            if not isinstance(data, list):
+                # Ошибка на весь пакет (например, лимит запросов) приходит одним объектом
+                raise RpcError(url, data.get("error") or {})
+            # Ошибка отдельного вызова не отменяет весь пакет: его result заменяется на RpcError
+            for item in data:
+                if "error" in item:
+                    # Временная ошибка узла означает, что весь ответ ненадежен - пробуем другой endpoint/повтор
+                    if item["error"].get("code") in RPC_RETRY_CODES:
+                        raise RpcError(url, item["error"])
+                    item["result"] = RpcError(url, item["error"])
+                elif "result" not in item:
+                    raise RuntimeError(f"Некорректный ответ RPC от {url}")
+    except Exception:
+        # Ошибочный endpoint штрафуется максимальной задержкой
+        _update_latency(url, HTTP_TIMEOUT)
+        raise
+    
+    _update_latency(url, time.monotonic() - started)
+    return data
+
+
+@retry(attempts=4, base=0.5, jitter=True)
+async def hedged_rpc(payload: Union[dict, list]) -> Union[dict, list]:
+    """
+    Отправляет один и тот же JSON-RPC запрос на несколько самых быстрых endpoint'ов
+    параллельно и возвращает первый корректный ответ, остальные запросы отменяются
+    """
+    endpoints = sorted(ENDPOINTS, key=endpoint_latency.__getitem__)[:HEDGE_FANOUT]
+    started = time.monotonic()
+    pending = {asyncio.create_task(_post_rpc(url, payload)): url for url in endpoints}
+    last_error: Optional[BaseException] = None
+    
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Исключения читаются у всех завершенных задач, иначе asyncio предупредит о непрочитанной ошибке
+            result_task = None
+            for task in done:
+                del pending[task]
+                if task.exception() is None:
+                    result_task = result_task or task
+                else:
+                    last_error = task.exception()
+            if result_task:
+                return result_task.result()
+        # Ни один endpoint не ответил - пробрасываем последнюю ошибку, чтобы retry мог ее оценить
+        raise last_error
+    finally:
+        # Отмененные endpoint'ы были медленнее победителя - учитываем это в их задержке
+        for task, url in pending.items():
+            task.cancel()
+            _update_latency(url, time.monotonic() - started)
+
+
+async def rpc_call(method: str, params: list) -> Any:
+    """
+    Выполняет один JSON-RPC вызов и возвращает его result
+    """
+    response = await hedged_rpc({"jsonrpc": "2.0", "id": 1, "method": method, "params": params})
+    return response["result"]
+
+
+async def rpc_batch(calls: List[Tuple[str, list]]) -> Dict[int, Any]:
+    """
+    Выполняет несколько JSON-RPC вызовов одним HTTP запросом (пакетный режим)
+    Возвращает словарь {id вызова: result}, id нумеруются с 1 в порядке calls;
+    для вызовов, завершившихся ошибкой, вместо result возвращается RpcError
+    """
+    payload = [
+        {"jsonrpc": "2.0", "id": call_id, "method": method, "params": params}
+        for call_id, (method, params) in enumerate(calls, start=1)
+    ]
+    
+    # Порядок ответов в пакете не гарантирован, сопоставляем по id
+    return {item["id"]: item["result"] for item in await hedged_rpc(payload)}
+
+
+async def get_usdc_balance() -> float:
+    """
+    Получает текущий баланс USDC на адресе
+    """
+    try:
+        # Если токен аккаунт еще не создан, баланс равен нулю
+        result = await rpc_call("getTokenAccountBalance", [ATA_STR, {"commitment": "confirmed"}])
+        return result["value"]["uiAmount"] or 0.0
     except Exception as e:
-        print(f"Ошибка при получении баланса: {e}")
+        if not _is_account_not_found(e):
+            write_lines([f"Ошибка при получении баланса: {e}"])
         return 0.0
 
 
@@ -86,51 +328,97 @@ def format_number(value: float) -> str:
     if value == 0:
         return "0"
     
-    # Разделяем на целую и дробную части
-    parts = f"{value:.10f}".rstrip('0').rstrip('.').split('.')
-    integer_part = parts[0]
-    decimal_part = parts[1] if len(parts) > 1 and parts[1] else None
-    
-    # Форматируем целую часть с пробелами каждые 3 цифры справа налево
-    formatted_integer = ""
-    for i, digit in enumerate(reversed(integer_part)):
-        if i > 0 and i % 3 == 0:
-            formatted_integer = " " + formatted_integer
-        formatted_integer = digit + formatted_integer
-    
-    # Объединяем целую и дробную части
-    if decimal_part:
-        return f"{formatted_integer}.{decimal_part}"
-    else:
-        return formatted_integer
+    # Разделители тысяч расставляет встроенное форматирование, затем запятые заменяются пробелами
+    return f"{value:,.10f}".rstrip('0').rstrip('.').translate(_THOUSANDS_SEPARATOR)
 
 
 def get_received_in_period(seconds: int) -> float:
     """
     Подсчитывает сумму USDC, полученную за указанный период в секундах
     """
-    if not transaction_history:
+    if not history_size:
         return 0.0
     
-    cutoff_time = datetime.now() - timedelta(seconds=seconds)
-    total = sum(amount for timestamp, amount in transaction_history if timestamp >= cutoff_time)
-    return total
+    # Первая транзакция внутри периода находится бинарным поиском, дальше - сумма непрерывного среза
+    i = np.searchsorted(history_ts[:history_size], time.monotonic() - seconds)
+    return float(history_amounts[i:history_size].sum())
 
 
-def send_discord_message(content: str, embed: Optional[dict] = None):
+def record_received(amount: float, block_time: float):
+    """
+    Добавляет входящий перевод в историю (block_time - время блока, epoch секунды)
+    """
+    global history_ts, history_amounts, history_size
+    
+    # Время блока переводится в шкалу time.monotonic(), не зависящую от перевода системных часов
+    timestamp = time.monotonic() - max(time.time() - block_time, 0.0)
+    
+    if history_size == len(history_ts):
+        history_ts = np.resize(history_ts, 2 * history_size)
+        history_amounts = np.resize(history_amounts, 2 * history_size)
+    
+    # История должна оставаться упорядоченной по времени для бинарного поиска
+    history_ts[history_size] = max(timestamp, history_ts[history_size - 1]) if history_size else timestamp
+    history_amounts[history_size] = amount
+    history_size += 1
+    _trim_history()
+
+
+def _trim_history():
+    """
+    Удаляет из истории транзакции старше самого длинного периода статистики
+    """
+    global history_size
+    
+    i = np.searchsorted(history_ts[:history_size], time.monotonic() - HISTORY_WINDOW)
+    if i == 0:
+        return
+    
+    # Сдвигаем оставшиеся транзакции в начало массивов
+    remaining = history_size - i
+    history_ts[:remaining] = history_ts[i:history_size]
+    history_amounts[:remaining] = history_amounts[i:history_size]
+    history_size = remaining
+
+
+@retry(attempts=4, base=0.5, jitter=True)
+async def _post_discord(body: bytes, headers: dict):
+    """
+    Отправляет тело запроса в Discord webhook
+    """
+    async with http_session.post(
+        DISCORD_WEBHOOK_URL, data=body, headers=headers, timeout=HTTP_REQUEST_TIMEOUT
+    ) as response:
+        response.raise_for_status()
+
+
+async def send_discord_message(content: str, embed: Optional[dict] = None):
     """
     Отправляет сообщение в Discord webhook
     """
+    global discord_gzip_enabled
+    
     try:
         payload = {"content": content}
         if embed:
             payload["embeds"] = [embed]
+        body = orjson.dumps(payload)
         
-        response = requests.post(DISCORD_WEBHOOK_URL, json=payload, timeout=10)
-        response.raise_for_status()
+        if discord_gzip_enabled:
+            try:
+                # Сжимаем один раз, повторные попытки отправляют те же байты
+                await _post_discord(gzip.compress(body), DISCORD_GZIP_HEADERS)
+                return True
+            except aiohttp.ClientResponseError as e:
+                if e.status not in DISCORD_GZIP_REJECT_STATUSES:
+                    raise
+                # Сжатое тело отклонено - дальше отправляем без сжатия
+                discord_gzip_enabled = False
+        
+        await _post_discord(body, JSON_HEADERS)
         return True
     except Exception as e:
-        print(f"Ошибка при отправке в Discord: {e}")
+        write_lines([f"Ошибка при отправке в Discord: {e}"])
         return False
 
 
@@ -138,8 +426,7 @@ def get_statistics_data() -> dict:
     """
     Получает данные статистики по периодам
     """
-    now = datetime.now()
-    elapsed_seconds = (now - monitoring_start_time).total_seconds() if monitoring_start_time else 0
+    elapsed_seconds = time.monotonic() - monitoring_start_time if monitoring_start_time is not None else 0
     
     last_5_min = get_received_in_period(300)  # 5 минут
     last_15_min = get_received_in_period(900) if elapsed_seconds >= 900 else None  # 15 минут
@@ -158,33 +445,45 @@ def get_statistics_data() -> dict:
     }
 
 
-def print_statistics():
+def write_lines(lines: List[str]):
     """
-    Выводит статистику по периодам в консоль
+    Выводит блок строк в консоль одной записью
     """
-    stats = get_statistics_data()
-    
-    print("─" * 60)
-    print("📊 СТАТИСТИКА ПО ПЕРИОДАМ:")
-    print(f"   За последние 5 минут:    {format_number(stats['last_5_min'])} USDC")
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+
+def format_statistics(stats: dict) -> List[str]:
+    """
+    Формирует строки статистики по периодам для вывода в консоль
+    """
+    lines = [
+        "─" * 60,
+        "📊 СТАТИСТИКА ПО ПЕРИОДАМ:",
+        f"   За последние 5 минут:    {format_number(stats['last_5_min'])} USDC",
+    ]
     
     if stats['last_15_min'] is not None:
-        print(f"   За последние 15 минут:   {format_number(stats['last_15_min'])} USDC")
+        lines.append(f"   За последние 15 минут:   {format_number(stats['last_15_min'])} USDC")
     
     if stats['last_hour'] is not None:
-        print(f"   За последний час:         {format_number(stats['last_hour'])} USDC")
+        lines.append(f"   За последний час:         {format_number(stats['last_hour'])} USDC")
     
     if stats['last_6h'] is not None:
-        print(f"   За последние 6 часов:    {format_number(stats['last_6h'])} USDC")
+        lines.append(f"   За последние 6 часов:    {format_number(stats['last_6h'])} USDC")
     
     if stats['last_12h'] is not None:
-        print(f"   За последние 12 часов:   {format_number(stats['last_12h'])} USDC")
+        lines.append(f"   За последние 12 часов:   {format_number(stats['last_12h'])} USDC")
     
     if stats['last_24h'] is not None:
-        print(f"   За последние сутки:       {format_number(stats['last_24h'])} USDC")
+        lines.append(f"   За последние сутки:       {format_number(stats['last_24h'])} USDC")
     
-    print(f"   С начала мониторинга:     {format_number(total_usdc_received)} USDC")
-    print("─" * 60)
+    lines.append(f"   С начала мониторинга:     {format_number(total_usdc_received)} USDC")
+    
+    if last_tx_time is not None:
+        lines.append(f"   Последний перевод:        {last_tx_time.strftime('%Y-%m-%d %H:%M:%S')}")
+    lines.append("─" * 60)
+    return lines
 
 
 def format_time_remaining(target_date: datetime) -> str:
@@ -246,151 +545,322 @@ def format_time_remaining(target_date: datetime) -> str:
     return " ".join(parts)
 
 
-def send_statistics_to_discord(current_balance: float, current_time_str: str):
+async def send_statistics_to_discord(current_balance: float, current_time_str: str, stats: dict):
     """
     Отправляет статистику в Discord webhook
     """
-    stats = get_statistics_data()
-    
+    # Шаблон embed собран при запуске, обновляются только значения полей
+    fields = _EMBED_FIELDS
+    fields[0]["value"] = f"{format_number(current_balance)} USDC"
+    fields[1]["value"] = f"{format_number(stats['last_5_min'])} USDC"
     # Получаем оставшееся время в читаемом формате
-    time_remaining = format_time_remaining(END_DATE)
-    
-    # Формируем поля для embed
-    fields = [
-        {
-            "name": "💰 Всего собрано",
-            "value": f"{format_number(current_balance)} USDC",
-            "inline": False
-        },
-        {
-            "name": "⏱️ За последние 5 минут",
-            "value": f"{format_number(stats['last_5_min'])} USDC",
-            "inline": False
-        },
-        {
-            "name": "⏰ До окончания",
-            "value": time_remaining,
-            "inline": False
-        }
-    ]
-    
-    # Добавляем только те периоды, для которых достаточно данных
-    if stats['last_15_min'] is not None:
-        fields.append({
-            "name": "⏱️ За последние 15 минут",
-            "value": f"{format_number(stats['last_15_min'])} USDC",
-            "inline": False
-        })
-    
-    if stats['last_hour'] is not None:
-        fields.append({
-            "name": "⏱️ За последний час",
-            "value": f"{format_number(stats['last_hour'])} USDC",
-            "inline": False
-        })
-    
-    if stats['last_6h'] is not None:
-        fields.append({
-            "name": "⏱️ За последние 6 часов",
-            "value": f"{format_number(stats['last_6h'])} USDC",
-            "inline": False
-        })
-    
-    if stats['last_12h'] is not None:
-        fields.append({
-            "name": "⏱️ За последние 12 часов",
-            "value": f"{format_number(stats['last_12h'])} USDC",
-            "inline": False
-        })
+    fields[2]["value"] = format_time_remaining(END_DATE)
+    
+    # Добавляем только те периоды, для которых достаточно данных.
+    # Периоды становятся доступны по возрастанию длительности, поэтому заполненные поля идут подряд
+    count = 3
+    for key in _EMBED_PERIOD_KEYS:
+        if stats[key] is None:
+            break
+        fields[count]["value"] = f"{format_number(stats[key])} USDC"
+        count += 1
+    
+    _EMBED_TEMPLATE["fields"] = fields[:count]
+    await send_discord_message("", _EMBED_TEMPLATE)
+
+
+def _received_amount(meta: dict) -> Tuple[float, float]:
+    """
+    Считает сумму USDC, зачисленную на отслеживаемый адрес в транзакции,
+    по разнице postTokenBalances и preTokenBalances
+    Возвращает (получено, баланс после транзакции)
+    """
+    def is_monitored(token_balance: dict) -> bool:
+        return token_balance.get("owner") == MONITORED_ADDRESS and token_balance["mint"] == USDC_MINT_ADDRESS
     
-    if stats['last_24h'] is not None:
-        fields.append({
-            "name": "⏱️ За последние сутки",
-            "value": f"{format_number(stats['last_24h'])} USDC",
-            "inline": False
-        })
-    
-    # Формируем embed для Discord
-    embed = {
-        "title": "Ranger Finance сбор USDC",
-        "color": 0x3498db,  # Синий цвет
-        "fields": fields,
-        "footer": {
-            "text": f"Адрес: {MONITORED_ADDRESS[:8]}...{MONITORED_ADDRESS[-8:]}"
-        }
+    pre_amounts = {
+        token_balance["accountIndex"]: int(token_balance["uiTokenAmount"]["amount"])
+        for token_balance in meta["preTokenBalances"] if is_monitored(token_balance)
     }
     
-    send_discord_message("", embed)
+    received = 0
+    post_balance = 0
+    for token_balance in meta["postTokenBalances"]:
+        if is_monitored(token_balance):
+            post_amount = int(token_balance["uiTokenAmount"]["amount"])
+            post_balance += post_amount
+            # Исходящие переводы (отрицательная разница) не учитываются
+            received += max(post_amount - pre_amounts.get(token_balance["accountIndex"], 0), 0)
+    
+    return received / 10 ** USDC_DECIMALS, post_balance / 10 ** USDC_DECIMALS
 
 
-def monitor_usdc_transactions():
+async def sync_transactions(balance: Optional[float] = None) -> int:
     """
-    Основная функция мониторинга
+    Получает баланс и все новые транзакции токен аккаунта с момента последней сверки
+    и учитывает каждый входящий перевод. Возвращает количество новых транзакций
+    Если баланс уже известен (из WebSocket уведомления), он не запрашивается повторно
     """
-    global total_usdc_received, transaction_history, monitoring_start_time
-    
-    print("=" * 60)
-    print("Монитор USDC транзакций запущен")
-    print(f"Адрес: {MONITORED_ADDRESS}")
-    print(f"Интервал проверки: {CHECK_INTERVAL} секунд (5 минут)")
-    print("=" * 60)
-    print()
-    
-    # Получаем начальный баланс
-    initial_balance = get_usdc_balance(MONITORED_ADDRESS)
-    monitoring_start_time = datetime.now()
-    print(f"[{monitoring_start_time.strftime('%Y-%m-%d %H:%M:%S')}] Начальный баланс USDC: {format_number(initial_balance)} USDC")
-    print()
+    global last_known_balance, last_signature
+    
+    async with sync_lock:
+        # Баланс и первая страница новых подписей получаются одним пакетным запросом
+        signatures_opts = {"limit": SIGNATURES_PAGE_LIMIT, "commitment": "confirmed"}
+        if last_signature:
+            signatures_opts["until"] = last_signature
+        calls = [("getSignaturesForAddress", [ATA_STR, signatures_opts])]
+        if balance is None:
+            calls.append(("getTokenAccountBalance", [ATA_STR, {"commitment": "confirmed"}]))
+        results = await rpc_batch(calls)
+        
+        if balance is None:
+            balance_result = results[2]
+            if not isinstance(balance_result, RpcError):
+                balance = balance_result["value"]["uiAmount"] or 0.0
+            elif _is_account_not_found(balance_result):
+                # Токен аккаунт еще не создан - баланс нулевой
+                balance = 0.0
+        if balance is not None:
+            last_known_balance = balance
+        
+        # Без списка подписей сверять нечего - ошибка пробрасывается вызывающему
+        if isinstance(results[1], RpcError):
+            raise results[1]
+        
+        # Подписи приходят от новых к старым, догружаем остальные страницы
+        signatures = results[1]
+        page = signatures
+        while len(page) == SIGNATURES_PAGE_LIMIT:
+            page = await rpc_call("getSignaturesForAddress", [ATA_STR, {**signatures_opts, "before": page[-1]["signature"]}])
+            signatures.extend(page)
+        
+        if not signatures:
+            return 0
+        
+        # Транзакции загружаются пакетами ограниченного размера от старых к новым;
+        # last_signature продвигается после каждой обработанной транзакции, поэтому ошибка
+        # следующего пакета не заставляет заново загружать уже учтенные
+        signatures.reverse()
+        tx_opts = {"encoding": "json", "commitment": "confirmed", "maxSupportedTransactionVersion": 0}
+        processed = 0
+        for start in range(0, len(signatures), TRANSACTIONS_BATCH_SIZE):
+            chunk = signatures[start:start + TRANSACTIONS_BATCH_SIZE]
+            transactions = await rpc_batch([("getTransaction", [info["signature"], tx_opts]) for info in chunk])
+            
+            for call_id, info in enumerate(chunk, start=1):
+                transaction = transactions[call_id]
+                if transaction is None:
+                    # Транзакция еще не доступна на этом узле - обработаем ее при следующей сверке
+                    return processed
+                
+                if isinstance(transaction, RpcError):
+                    # Постоянная ошибка не исправится повтором - пропускаем транзакцию, чтобы не застрять на ней
+                    write_lines([f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Пропущена транзакция {info['signature']}: {transaction}", ""])
+                else:
+                    _process_transaction(info, transaction)
+                
+                last_signature = info["signature"]
+                processed += 1
+        
+        return processed
+
+
+def _process_transaction(info: dict, transaction: dict):
+    """
+    Учитывает входящий перевод из загруженной транзакции
+    """
+    global total_usdc_received, last_tx_time
+    
+    if info["err"] is not None:
+        return
+    
+    received, post_balance = _received_amount(transaction["meta"])
+    if received <= 0:
+        return
+    
+    block_time = transaction["blockTime"] or time.time()
+    total_usdc_received += received
+    
+    # Сохраняем транзакцию в историю с реальным временем блока
+    record_received(received, block_time)
+    last_tx_time = datetime.fromtimestamp(block_time)
+    
+    write_lines([
+        f"[{last_tx_time.strftime('%Y-%m-%d %H:%M:%S')}] ⚠️  ОБНАРУЖЕН НОВЫЙ ВХОДЯЩИЙ ПЕРЕВОД!",
+        f"    Получено: {format_number(received)} USDC",
+        f"    Баланс после перевода: {format_number(post_balance)} USDC",
+        "",
+    ])
+    
+    # Уведомляем Discord сразу, не дожидаясь периодической статистики
+    task = asyncio.create_task(send_discord_message(
+        f"💸 Новый входящий перевод: {format_number(received)} USDC "
+        f"(баланс: {format_number(post_balance)} USDC)"
+    ))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
+async def sync_after_notification(balance: float):
+    """
+    Разбирает транзакции после WebSocket уведомления. RPC узел, отвечающий на запросы,
+    может еще не знать о транзакции, о которой сообщил WebSocket узел: если баланс вырос,
+    а новых транзакций не нашлось, сверка повторяется через короткую паузу
+    """
+    previous_balance = last_known_balance
+    for attempt in range(NOTIFICATION_SYNC_ATTEMPTS):
+        if attempt:
+            await asyncio.sleep(NOTIFICATION_SYNC_RETRY_DELAY)
+        if await sync_transactions(balance) or balance <= previous_balance:
+            return
+
+
+async def watch_usdc_account():
+    """
+    Подписывается на изменения USDC токен аккаунта через WebSocket
+    и разбирает новые транзакции в момент их появления
+    """
+    subscribe_request = orjson.dumps({
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "accountSubscribe",
+        "params": [ATA_STR, {"encoding": "base64+zstd", "commitment": "confirmed"}]
+    }).decode()
     
     while True:
         try:
-            current_time = datetime.now()
-            current_time_str = current_time.strftime('%Y-%m-%d %H:%M:%S')
-            
-            # Получаем текущий баланс
-            current_balance = get_usdc_balance(MONITORED_ADDRESS)
-            
-            # Проверяем изменение баланса
-            if current_balance > initial_balance:
-                received = current_balance - initial_balance
-                total_usdc_received += received
+            async with http_session.ws_connect(SOLANA_WS_URL, heartbeat=WS_HEARTBEAT) as websocket:
+                await websocket.send_str(subscribe_request)
+                # Первое сообщение - подтверждение подписки
+                confirmation = orjson.loads(await websocket.receive_str())
+                if "error" in confirmation:
+                    raise RuntimeError(f"подписка отклонена: {confirmation['error']}")
                 
-                # Сохраняем транзакцию в историю
-                transaction_history.append((current_time, received))
+                # Сверяемся после (пере)подключения, чтобы не пропустить переводы во время разрыва
+                await sync_transactions()
                 
-                print(f"[{current_time_str}] ⚠️  ОБНАРУЖЕН НОВЫЙ ВХОДЯЩИЙ ПЕРЕВОД!")
-                print(f"    Получено: {format_number(received)} USDC")
-                print(f"    Текущий баланс: {format_number(current_balance)} USDC")
-                print()
+                async for message in websocket:
+                    if message.type != aiohttp.WSMsgType.TEXT:
+                        break
+                    notification = orjson.loads(message.data)
+                    # Данные аккаунта приходят как [base64 строка, "base64+zstd"], баланс читается напрямую из байтов
+                    compressed = base64.b64decode(notification["params"]["result"]["value"]["data"][0])
+                    data = ZSTD_DECOMPRESSOR.decompressobj().decompress(compressed)
+                    # Закрытый или пустой аккаунт приходит без данных - его баланс нулевой
+                    balance = (
+                        struct.unpack_from('<Q', data, TOKEN_AMOUNT_OFFSET)[0] / 10 ** USDC_DECIMALS
+                        if len(data) >= TOKEN_AMOUNT_OFFSET + 8 else 0.0
+                    )
+                    
+                    # Изменение аккаунта означает новую транзакцию - сразу разбираем ее,
+                    # баланс из уведомления повторно не запрашивается
+                    try:
+                        await sync_after_notification(balance)
+                    except Exception as e:
+                        write_lines([f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Ошибка при разборе транзакций: {e}", ""])
+        except Exception as e:
+            write_lines([f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Ошибка WebSocket подписки: {e}", ""])
+        
+        # Переподключаемся после небольшой паузы
+        await asyncio.sleep(WS_RECONNECT_DELAY)
+
+
+async def monitor_usdc_transactions():
+    """
+    Основная функция мониторинга
+    """
+    global monitoring_start_time, last_known_balance, last_signature, http_session
+    
+    write_lines([
+        "=" * 60,
+        "Монитор USDC транзакций запущен",
+        f"Адрес: {MONITORED_ADDRESS}",
+        f"Интервал статистики: {CHECK_INTERVAL} секунд (5 минут)",
+        "=" * 60,
+        "",
+    ])
+    
+    # Одна сессия с keep-alive для всех исходящих запросов: соединения переживают паузу между проверками
+    http_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit_per_host=HTTP_MAX_CONNECTIONS, keepalive_timeout=2 * CHECK_INTERVAL),
+    )
+    
+    watcher: Optional[asyncio.Task] = None
+    try:
+        # Получаем начальный баланс
+        last_known_balance = await get_usdc_balance()
+        # Запоминаем последнюю подпись, чтобы дальше учитывать только новые транзакции.
+        # Без нее первая сверка разобрала бы всю историю адреса, поэтому ошибка здесь критическая
+        signatures = await rpc_call("getSignaturesForAddress", [ATA_STR, {"limit": 1, "commitment": "confirmed"}])
+        last_signature = signatures[0]["signature"] if signatures else None
+        monitoring_start_time = time.monotonic()
+        write_lines([
+            f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Начальный баланс USDC: {format_number(last_known_balance)} USDC",
+            "",
+        ])
+        
+        # Новые транзакции разбираются по уведомлениям WebSocket, здесь - периодическая сверка и статистика
+        watcher = asyncio.create_task(watch_usdc_account())
+        
+        # Проверки выполняются по сетке с шагом CHECK_INTERVAL от момента запуска,
+        # поэтому время обработки не накапливается в сдвиг интервала
+        next_tick = time.monotonic()
+        
+        while True:
+            discord_task = None
+            try:
+                current_time_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 
-                initial_balance = current_balance
-            elif current_balance < initial_balance:
-                # Если баланс уменьшился (отправка), обновляем начальный баланс
-                initial_balance = current_balance
-            
-            # Выводим статистику в консоль
-            print(f"[{current_time_str}] Всего собрано: {format_number(current_balance)} USDC")
-            print_statistics()
-            
-            # Отправляем статистику в Discord
-            send_statistics_to_discord(current_balance, current_time_str)
+                # Сверка на случай пропущенных WebSocket уведомлений. Ее ошибка не должна
+                # отменять статистику - тогда используется последний известный баланс
+                try:
+                    await sync_transactions()
+                except Exception as e:
+                    write_lines([f"[{current_time_str}] Ошибка сверки транзакций: {e}", ""])
+                current_balance = last_known_balance
+                
+                # Статистика считается один раз за проверку и используется для консоли и Discord
+                stats = get_statistics_data()
+                
+                # Отправляем статистику в Discord, не дожидаясь ответа
+                discord_task = asyncio.create_task(send_statistics_to_discord(current_balance, current_time_str, stats))
+                
+                # Выводим статистику в консоль одним блоком
+                write_lines([
+                    f"[{current_time_str}] Всего собрано: {format_number(current_balance)} USDC",
+                    *format_statistics(stats),
+                    "Ожидание следующей проверки...",
+                    "",
+                ])
+                
+            except Exception as e:
+                write_lines([f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Ошибка: {e}", ""])
             
-            print(f"Ожидание следующей проверки...")
-            print()
+            next_tick += CHECK_INTERVAL
+            now = time.monotonic()
+            if next_tick <= now:
+                # Проверка затянулась дольше интервала - пропускаем упущенные слоты, а не догоняем их
+                next_tick += ((now - next_tick) // CHECK_INTERVAL + 1) * CHECK_INTERVAL
             
-        except Exception as e:
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Ошибка: {e}")
-            print()
-        
-        # Ожидание перед следующей проверкой
-        time.sleep(CHECK_INTERVAL)
+            # Ожидание до следующей проверки идет параллельно с отправкой в Discord
+            if discord_task:
+                await asyncio.gather(discord_task, asyncio.sleep(next_tick - now))
+            else:
+                await asyncio.sleep(next_tick - now)
+    finally:
+        # Останавливаем фоновые задачи до закрытия сессии, которой они пользуются
+        if watcher:
+            watcher.cancel()
+            await asyncio.gather(watcher, return_exceptions=True)
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        await http_session.close()
 
 
 if __name__ == "__main__":
     try:
-        monitor_usdc_transactions()
+        asyncio.run(monitor_usdc_transactions())
     except KeyboardInterrupt:
-        print("\n\nМониторинг остановлен пользователем")
+        write_lines(["", "", "Мониторинг остановлен пользователем"])
     except Exception as e:
-        print(f"\nКритическая ошибка: {e}")
+        write_lines(["", f"Критическая ошибка: {e}"])
 